@@ -9,27 +9,25 @@ Free tier: 5000 API calls/day — more than enough for dev/demo.
 """
 
 import os
-import json
 import uuid
-import requests
+import asyncio
+import httpx
+import orjson
 import psycopg2
 import psycopg2.extras
+from psycopg2.extras import Json
+from datetime import datetime, timezone
 from loguru import logger
 from tenacity import retry, stop_after_attempt, wait_exponential
 from dotenv import load_dotenv
+from db import RAW_EVENT_COLUMNS, get_db_connection, release_db_connection
 
 load_dotenv()
 
-# ── DB Connection ──────────────────────────────────────────────────────────────
 
-def get_db_connection():
-    return psycopg2.connect(
-        host=os.getenv("DB_HOST", "localhost"),
-        port=os.getenv("DB_PORT", 5432),
-        dbname=os.getenv("DB_NAME"),
-        user=os.getenv("DB_USER"),
-        password=os.getenv("DB_PASSWORD")
-    )
+def _orjson_dumps(obj) -> str:
+    """orjson-backed serializer for psycopg2's Json adapter (which expects str)."""
+    return orjson.dumps(obj).decode()
 
 
 # ── API Fetcher ────────────────────────────────────────────────────────────────
@@ -44,7 +42,8 @@ class TicketmasterIngestor:
             raise ValueError("TICKETMASTER_API_KEY not set in .env")
 
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(min=2, max=10))
-    def fetch_events(self, country_code: str = "DE", page: int = 0) -> dict:
+    async def fetch_events(self, client: httpx.AsyncClient,
+                           country_code: str = "DE", page: int = 0) -> dict:
         """Fetch one page of events from Ticketmaster API."""
         params = {
             "apikey": self.api_key,
@@ -53,126 +52,133 @@ class TicketmasterIngestor:
             "page": page,
             "sort": "date,asc"
         }
-        response = requests.get(self.BASE_URL, params=params, timeout=15)
+        response = await client.get(self.BASE_URL, params=params, timeout=15)
         response.raise_for_status()
         return response.json()
 
-    def parse_event(self, event: dict) -> dict:
-        """Flatten a Ticketmaster event JSON into a clean row dict."""
-        # Safely drill into nested JSON
-        embedded = event.get("_embedded", {})
-        venues = embedded.get("venues", [{}])
+    async def fetch_pages(self, country_code: str = "DE", max_pages: int = 5) -> list[dict]:
+        """Fetch page 0 to learn the page count, then the remaining pages concurrently."""
+        async with httpx.AsyncClient(http2=True) as client:
+            logger.info(f"Fetching page 0 | country={country_code}")
+            first = await self.fetch_events(client, country_code=country_code, page=0)
+
+            # Only request pages that exist, to stay inside the daily quota
+            last_page = min(max_pages, first.get("page", {}).get("totalPages", 1))
+            if last_page > 1:
+                logger.info(f"Fetching pages 1-{last_page - 1} concurrently | country={country_code}")
+            rest = await asyncio.gather(*(
+                self.fetch_events(client, country_code=country_code, page=page)
+                for page in range(1, last_page)
+            ))
+        return [first, *rest]
+
+    def parse_event(self, event: dict) -> tuple:
+        """Flatten a Ticketmaster event JSON into a row tuple in RAW_EVENT_COLUMNS order."""
+        # Safely drill into nested JSON, binding each .get once
+        get = event.get
+        venues = get("_embedded", {}).get("venues", [{}])
         venue = venues[0] if venues else {}
-        classifications = event.get("classifications", [{}])
+        venue_get = venue.get
+        classifications = get("classifications", [{}])
         classification = classifications[0] if classifications else {}
-        price_ranges = event.get("priceRanges", [{}])
+        classification_get = classification.get
+        price_ranges = get("priceRanges", [{}])
         price = price_ranges[0] if price_ranges else {}
-        dates = event.get("dates", {}).get("start", {})
-        location = venue.get("location", {})
-
-        return {
-            "source": "ticketmaster",
-            "raw_event_id": event.get("id"),
-            "raw_payload": json.dumps(event),
-            "event_name": event.get("name"),
-            "event_date": dates.get("localDate"),
-            "event_time": dates.get("localTime"),
-            "venue_name": venue.get("name"),
-            "venue_city": venue.get("city", {}).get("name"),
-            "venue_country": venue.get("country", {}).get("name"),
-            "venue_lat": location.get("latitude"),
-            "venue_lon": location.get("longitude"),
-            "category": classification.get("segment", {}).get("name"),
-            "subcategory": classification.get("genre", {}).get("name"),
-            "price_min": str(price.get("min", "")),
-            "price_max": str(price.get("max", "")),
-            "currency": price.get("currency"),
-            "url": event.get("url"),
-            "status": event.get("dates", {}).get("status", {}).get("code"),
-        }
-
-    def load_to_raw(self, conn, rows: list[dict], run_id: str) -> int:
-        """Bulk insert parsed rows into raw.events, skip duplicates."""
+        price_get = price.get
+        dates = get("dates", {})
+        start = dates.get("start", {})
+        location = venue_get("location", {})
+
+        return (
+            "ticketmaster",                                  # source
+            get("id"),                                       # raw_event_id
+            Json(event, dumps=_orjson_dumps),                # raw_payload
+            get("name"),                                     # event_name
+            start.get("localDate"),                          # event_date
+            start.get("localTime"),                          # event_time
+            venue_get("name"),                               # venue_name
+            venue_get("city", {}).get("name"),               # venue_city
+            venue_get("country", {}).get("name"),            # venue_country
+            location.get("latitude"),                        # venue_lat
+            location.get("longitude"),                       # venue_lon
+            classification_get("segment", {}).get("name"),   # category
+            classification_get("genre", {}).get("name"),     # subcategory
+            str(price_get("min", "")),                       # price_min
+            str(price_get("max", "")),                       # price_max
+            price_get("currency"),                           # currency
+            get("url"),                                      # url
+            dates.get("status", {}).get("code"),             # status
+        )
+
+    def load_to_raw(self, conn, rows: list[tuple], run_id: str) -> int:
+        """Bulk insert parsed rows into raw.events, skip duplicates. The caller commits."""
         if not rows:
             return 0
 
-        insert_sql = """
-            INSERT INTO raw.events (
-                source, raw_event_id, raw_payload, event_name, event_date,
-                event_time, venue_name, venue_city, venue_country,
-                venue_lat, venue_lon, category, subcategory,
-                price_min, price_max, currency, url, status
-            ) VALUES (
-                %(source)s, %(raw_event_id)s, %(raw_payload)s, %(event_name)s,
-                %(event_date)s, %(event_time)s, %(venue_name)s, %(venue_city)s,
-                %(venue_country)s, %(venue_lat)s, %(venue_lon)s, %(category)s,
-                %(subcategory)s, %(price_min)s, %(price_max)s, %(currency)s,
-                %(url)s, %(status)s
-            )
+        # A run is at most a few thousand rows, so a single multi-VALUES
+        # INSERT beats the temp-table + COPY round trips
+        columns = ", ".join(RAW_EVENT_COLUMNS)
+        insert_sql = f"""
+            INSERT INTO raw.events ({columns})
+            VALUES %s
             ON CONFLICT DO NOTHING
         """
         with conn.cursor() as cur:
-            psycopg2.extras.execute_batch(cur, insert_sql, rows, page_size=50)
-        conn.commit()
+            psycopg2.extras.execute_values(cur, insert_sql, rows, page_size=1000)
         return len(rows)
 
     def run(self, country_code: str = "DE", max_pages: int = 5):
         """Full ingestion run: fetch → parse → load."""
         run_id = str(uuid.uuid4())
+        # Timezone-aware, so Postgres converts it to the session time zone
+        # and it lines up with the server-side NOW() used for finished_at
+        started_at = datetime.now(timezone.utc)
         conn = get_db_connection()
         total_loaded = 0
 
-        # Log start
-        with conn.cursor() as cur:
-            cur.execute("""
-                INSERT INTO raw.ingestion_log (run_id, source, status)
-                VALUES (%s, 'ticketmaster', 'running')
-            """, (run_id,))
-        conn.commit()
+        # The run is logged once, after the fact, with started_at captured
+        # here; no 'running' row is inserted up front and later updated
+        log_sql = """
+            INSERT INTO raw.ingestion_log
+                (run_id, source, status, records_loaded, error_message,
+                 started_at, finished_at)
+            VALUES (%s, 'ticketmaster', %s, %s, %s, %s, NOW())
+        """
 
         try:
-            for page in range(max_pages):
-                logger.info(f"Fetching page {page} | country={country_code}")
-                data = self.fetch_events(country_code=country_code, page=page)
-
-                events = data.get("_embedded", {}).get("events", [])
-                if not events:
-                    logger.info("No more events found, stopping early.")
-                    break
-
-                rows = [self.parse_event(e) for e in events]
-                loaded = self.load_to_raw(conn, rows, run_id)
-                total_loaded += loaded
-                logger.success(f"Page {page}: loaded {loaded} records")
-
-                # Check if we've hit the last page
-                page_info = data.get("page", {})
-                if page >= page_info.get("totalPages", 1) - 1:
-                    break
-
-            # Update log: success
+            pages = asyncio.run(self.fetch_pages(country_code=country_code, max_pages=max_pages))
+            rows = [
+                self.parse_event(e)
+                for data in pages
+                for e in data.get("_embedded", {}).get("events", [])
+            ]
+            if not rows:
+                logger.info("No events found.")
+
+            total_loaded = self.load_to_raw(conn, rows, run_id)
+            logger.success(f"Fetched {len(pages)} page(s): loaded {total_loaded} records")
+
+            # Log success in the same transaction as the rows: one commit
             with conn.cursor() as cur:
-                cur.execute("""
-                    UPDATE raw.ingestion_log
-                    SET finished_at = NOW(), records_loaded = %s, status = 'success'
-                    WHERE run_id = %s
-                """, (total_loaded, run_id))
+                cur.execute(log_sql, (run_id, "success", total_loaded, None, started_at))
             conn.commit()
             logger.success(f"Ingestion complete. Total records: {total_loaded}")
 
         except Exception as e:
             logger.error(f"Ingestion failed: {e}")
-            with conn.cursor() as cur:
-                cur.execute("""
-                    UPDATE raw.ingestion_log
-                    SET finished_at = NOW(), status = 'failed', error_message = %s
-                    WHERE run_id = %s
-                """, (str(e), run_id))
-            conn.commit()
+            # Best effort: if the connection itself is gone, these calls
+            # fail too, and that must not mask the original error
+            try:
+                conn.rollback()
+                with conn.cursor() as cur:
+                    cur.execute(log_sql, (run_id, "failed", 0, str(e), started_at))
+                conn.commit()
+            except Exception as log_error:
+                logger.warning(f"Could not record failed run {run_id}: {log_error}")
             raise
 
         finally:
-            conn.close()
+            release_db_connection(conn)
 
         return total_loaded
 
@@ -0,0 +1,71 @@
+"""
+ingestion/db.py
+===============
+Shared PostgreSQL connection pool and raw.events column order for the
+ingestors and the pipeline.
+
+The pool is created on first use and kept for the life of the process,
+so a long-running scheduler pays the connect + auth handshake once
+instead of on every run. Always hand connections back with
+release_db_connection() rather than closing them.
+"""
+
+import os
+import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Insert column order for raw.events, shared by both ingestors: the CSV
+# COPY buffer and staging table, and the tuples parse_event returns
+RAW_EVENT_COLUMNS = [
+    "source", "raw_event_id", "raw_payload", "event_name", "event_date",
+    "event_time", "venue_name", "venue_city", "venue_country",
+    "venue_lat", "venue_lon", "category", "subcategory",
+    "price_min", "price_max", "currency", "url", "status",
+]
+
+_POOL = None
+_MAX_CONN = 4
+
+
+def _is_alive(conn) -> bool:
+    """Cheap liveness check for a pooled connection that may have gone stale."""
+    if conn.closed:
+        return False
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+def get_db_connection():
+    """Borrow a live connection from the process-wide pool."""
+    global _POOL
+    if _POOL is None:
+        _POOL = ThreadedConnectionPool(
+            minconn=1,
+            maxconn=_MAX_CONN,
+            host=os.getenv("DB_HOST", "localhost"),
+            port=os.getenv("DB_PORT", 5432),
+            dbname=os.getenv("DB_NAME"),
+            user=os.getenv("DB_USER"),
+            password=os.getenv("DB_PASSWORD")
+        )
+    # Idle connections can die between scheduled runs (server restart,
+    # idle timeout, network blip); discard them and take a fresh one
+    for _ in range(_MAX_CONN):
+        conn = _POOL.getconn()
+        if _is_alive(conn):
+            return conn
+        _POOL.putconn(conn, close=True)
+    return _POOL.getconn()
+
+
+def release_db_connection(conn):
+    """Return a connection to the pool; any open transaction is rolled back."""
+    _POOL.putconn(conn)
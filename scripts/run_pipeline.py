@@ -16,38 +16,34 @@ Usage:
   python scripts/run_pipeline.py --source csv --generate-sample
 """
 
-import os
 import sys
 import argparse
-import psycopg2
+import functools
 from pathlib import Path
 from loguru import logger
 from dotenv import load_dotenv
 
-# Make imports work from project root
-sys.path.insert(0, str(Path(__file__).parent.parent))
+# Make the flat ingestion modules importable from anywhere
+sys.path.insert(0, str(Path(__file__).parent.parent / "ingestion"))
 
 from api_ingestor import TicketmasterIngestor
 from csv_ingestor import CsvIngestor, generate_sample_csv
+from db import get_db_connection, release_db_connection
 
 load_dotenv()
 
 # ── Helpers ────────────────────────────────────────────────────────────────────
 
-def get_db_connection():
-    return psycopg2.connect(
-        host=os.getenv("DB_HOST", "localhost"),
-        port=os.getenv("DB_PORT", 5432),
-        dbname=os.getenv("DB_NAME"),
-        user=os.getenv("DB_USER"),
-        password=os.getenv("DB_PASSWORD")
-    )
+@functools.lru_cache(maxsize=None)
+def _read_sql(sql_path: str) -> str:
+    """Read a .sql file once per process; the scheduler re-runs the same files."""
+    with open(sql_path, "r") as f:
+        return f.read()
 
 
 def run_sql_file(conn, sql_path: str):
     """Execute a .sql file against the connected database."""
-    with open(sql_path, "r") as f:
-        sql = f.read()
+    sql = _read_sql(sql_path)
     with conn.cursor() as cur:
         cur.execute(sql)
     conn.commit()
@@ -139,28 +135,19 @@ def step_create_kpi_views(conn):
 
 # ── Main ───────────────────────────────────────────────────────────────────────
 
-def main():
-    parser = argparse.ArgumentParser(description="Event Warehouse ELT Pipeline")
-    parser.add_argument("--source", choices=["api", "csv"], default="api",
-                        help="Data source: api (Ticketmaster) or csv (local file)")
-    parser.add_argument("--csv-path", default="sample_events.csv",
-                        help="Path to CSV file (only used with --source csv)")
-    parser.add_argument("--generate-sample", action="store_true",
-                        help="Generate synthetic CSV data before loading")
-    parser.add_argument("--skip-ingest", action="store_true",
-                        help="Skip ingestion and only run transform/load steps")
-    args = parser.parse_args()
-
+def main_with_args(source: str = "api", csv_path: str = "sample_events.csv",
+                   generate_sample: bool = False, skip_ingest: bool = False):
+    """Run the pipeline with explicit options (used by main() and the scheduler)."""
     logger.info("🎉 Event Intelligence Data Warehouse — Pipeline Starting")
-    logger.info(f"   Source: {args.source}")
+    logger.info(f"   Source: {source}")
 
     # Generate sample CSV if requested
-    if args.generate_sample:
-        args.csv_path = generate_sample_csv(args.csv_path)
+    if generate_sample:
+        csv_path = generate_sample_csv(csv_path)
 
     # Step 1-2: Extract & Load
-    if not args.skip_ingest:
-        records = step_extract_load(args.source, args.csv_path)
+    if not skip_ingest:
+        records = step_extract_load(source, csv_path)
         logger.info(f"   Records ingested: {records}")
 
     # Steps 3-6: Transform, Load, Quality, KPIs
@@ -176,7 +163,27 @@ def main():
         logger.error(f"Pipeline failed at: {e}")
         raise
     finally:
-        conn.close()
+        release_db_connection(conn)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Event Warehouse ELT Pipeline")
+    parser.add_argument("--source", choices=["api", "csv"], default="api",
+                        help="Data source: api (Ticketmaster) or csv (local file)")
+    parser.add_argument("--csv-path", default="sample_events.csv",
+                        help="Path to CSV file (only used with --source csv)")
+    parser.add_argument("--generate-sample", action="store_true",
+                        help="Generate synthetic CSV data before loading")
+    parser.add_argument("--skip-ingest", action="store_true",
+                        help="Skip ingestion and only run transform/load steps")
+    args = parser.parse_args()
+
+    main_with_args(
+        source=args.source,
+        csv_path=args.csv_path,
+        generate_sample=args.generate_sample,
+        skip_ingest=args.skip_ingest,
+    )
 
 
 if __name__ == "__main__":
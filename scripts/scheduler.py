@@ -16,36 +16,32 @@ For production, replace with cron, Airflow, or Make (Integromat) trigger.
 
 import schedule
 import time
-import subprocess
-import sys
 from loguru import logger
 from datetime import datetime
 
+# Run the pipeline in-process so imports and the DB connection pool
+# survive between scheduled runs
+import run_pipeline
+
 
 def run_full_pipeline():
     logger.info(f"⏰ Scheduled run starting at {datetime.now()}")
-    result = subprocess.run(
-        [sys.executable, "scripts/run_pipeline.py", "--source", "api"],
-        capture_output=True,
-        text=True
-    )
-    if result.returncode == 0:
-        logger.success("Scheduled pipeline run completed successfully")
+    try:
+        run_pipeline.main_with_args(source="api")
+    except Exception as e:
+        logger.error(f"Scheduled pipeline run failed: {e}")
     else:
-        logger.error(f"Scheduled pipeline run failed:\n{result.stderr}")
+        logger.success("Scheduled pipeline run completed successfully")
 
 
 def run_quality_only():
     logger.info(f"🔍 Quality check run at {datetime.now()}")
-    result = subprocess.run(
-        [sys.executable, "scripts/run_pipeline.py", "--skip-ingest"],
-        capture_output=True,
-        text=True
-    )
-    if result.returncode == 0:
-        logger.success("Quality check completed")
+    try:
+        run_pipeline.main_with_args(skip_ingest=True)
+    except Exception as e:
+        logger.error(f"Quality check failed: {e}")
     else:
-        logger.error(f"Quality check failed:\n{result.stderr}")
+        logger.success("Quality check completed")
 
 
 # ── Schedule ───────────────────────────────────────────────────────────────────
@@ -61,6 +57,12 @@ logger.info("   Full pipeline: daily at 06:00")
 logger.info("   Quality checks: every hour")
 logger.info("   Press Ctrl+C to stop")
 
+# Sleep until the next job is due (capped at 5 minutes) instead of
+# waking every minute
 while True:
+    idle = schedule.idle_seconds()
+    if idle is None:
+        break
+    if idle > 0:
+        time.sleep(min(idle, 300))
     schedule.run_pending()
-    time.sleep(60)